@@ -7,17 +7,84 @@ This script:
 2. Fetches available tools and converts them to OpenAI function format
 3. Uses OpenAI to process user requests and execute Google Forms operations
 Usage:
-  python openai_google_forms_client.py "Create a survey about customer satisfaction"
+  python simple_client.py "Title: Customer Feedback | Questions: How satisfied are you?"
+  python simple_client.py   (prompts for the form request)
 """
 from __future__ import annotations
 import asyncio
+import hashlib
 import json
+import logging
 import os
+import re
 import sys
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Final, List, Tuple
+import fastjsonschema
+import orjson
 from dotenv import load_dotenv
 from fastmcp import Client
-from openai import OpenAI
+from openai import DEFAULT_CONNECTION_LIMITS, AsyncOpenAI, DefaultAioHttpClient
+from openai.types.chat import (
+    ChatCompletionMessageParam,
+    ChatCompletionMessageToolCallParam,
+    ChatCompletionSystemMessageParam,
+    ChatCompletionToolMessageParam,
+    ChatCompletionToolParam,
+)
+
+try:
+    import uvloop
+except ImportError:  # not available on Windows
+    uvloop = None
+
+logger = logging.getLogger(__name__)
+
+# Model settings shared by every completion call
+CHAT_KW: Final[Dict[str, Any]] = {"model": "gpt-4o", "temperature": 0.2}
+
+SYSTEM_PROMPT: Final[str] = "You are a helpful assistant that creates Google Forms. IMPORTANT: When creating forms, you can ONLY set the title during creation - do NOT include a description parameter. After creating a form, you MUST immediately add ALL the requested questions using add_text_question and add_multiple_choice_question tools in the EXACT ORDER they appear in the user input. Do not reorder questions - maintain the sequence provided. Do not stop after creating the form - continue until all questions are added. Parse the user input to extract the title and questions. For multiple choice questions, if options are provided in parentheses, use them. Otherwise, create reasonable default options. REQUIRED QUESTIONS: If a question is prefixed with 'required' (e.g., 'required How would you rate me...'), set required: true. If no 'required' prefix is present, set required: false. Always provide the final form URL when complete."
+SYSTEM_MSG: Final[ChatCompletionSystemMessageParam] = {"role": "system", "content": SYSTEM_PROMPT}
+
+BANNER: Final[str] = "\n".join([
+    "=== Google Forms Creator ===",
+    "Enter your form details:",
+    "Format: 'Title: [Your Title] | Questions: [Question 1] | [Question 2] | ...'",
+    "Example: 'Title: Customer Feedback | Questions: required What are your comments? | How satisfied are you? (Very Satisfied, Satisfied, Neutral, Dissatisfied, Very Dissatisfied)'",
+    "\nTo mark questions as REQUIRED, prefix them with 'required':",
+    "Example: 'Title: Survey | Questions: required How would you rate me? (Good, Bad) | What do you think? | required What should I improve?'",
+    "=" * 80,
+])
+
+# OpenAI connection pool size; the aiohttp transport turns this into its
+# TCPConnector(limit=...). A single run has at most one completion in flight;
+# the semaphore is process-wide so concurrent runs in one process (which
+# share the MCP connection) stay within the same number of requests.
+OPENAI_MAX_CONNECTIONS = 16
+OPENAI_SEM = asyncio.Semaphore(OPENAI_MAX_CONNECTIONS)
+
+# Upper bound on MCP tool calls in flight at once
+MAX_CONCURRENT_TOOL_CALLS = 8
+
+# Tool results from rounds older than the last HISTORY_KEEP_ROUNDS are cut
+# down to TOOL_SUMMARY_CHARS before being re-sent; create_form is kept
+# verbatim since its result holds the form ID and URL
+HISTORY_KEEP_ROUNDS = 3
+TOOL_SUMMARY_CHARS = 40
+PINNED_TOOL_RESULTS = {"create_form"}
+
+# Canonical request format: "Title: X | Questions: q1 | required q2 (opt1, opt2) | ..."
+TITLE_RE = re.compile(r"^\s*Title:\s*(.+?)\s*\|\s*Questions:\s*(.+?)\s*$", re.IGNORECASE | re.DOTALL)
+REQUIRED_RE = re.compile(r"^required\s+", re.IGNORECASE)
+OPTIONS_RE = re.compile(r"\(([^)]+)\)\s*$")
+# Matches "formId": "...", form_id=..., "Form ID: ..." and the form's edit URL;
+# the ':' or '=' separator is required so prose like "Form ID is ..." doesn't match
+FORM_ID_RE = re.compile(
+    r"\bform[\s_]?id[\"']?\s*[:=]\s*[\"']?([\w-]+)|/forms/d/([\w-]+)/edit", re.IGNORECASE
+)
+FORM_URL_RE = re.compile(r"https://docs\.google\.com/forms/[^\s\"',]+")
+
+# Parameters used for tools that don't declare an input schema
+_EMPTY_SCHEMA: Dict[str, Any] = {"type": "object", "properties": {}}
 
 class MCPClient:
     """FastMCP-based client that communicates with the Google Forms server."""
@@ -25,16 +92,29 @@ class MCPClient:
     def __init__(self, server_path: str):
         self.server_path = server_path
         self.client = None
+        self._tool_schemas: List[ChatCompletionToolParam] | None = None
+        self.validators: Dict[str, Callable[[Any], Any]] = {}
     
     async def start(self):
         """Start the MCP client connection."""
-        self.client = Client(self.server_path)
-        await self.client.__aenter__()
+        client = Client(self.server_path)
+        await client.__aenter__()
+        self.client = client
     
     async def stop(self):
         """Stop the MCP client connection."""
         if self.client:
             await self.client.__aexit__(None, None, None)
+            self.client = None
+        self._tool_schemas = None
+        self.validators = {}
+    
+    async def __aenter__(self) -> MCPClient:
+        await self.start()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.stop()
     
     async def list_tools(self) -> List[Dict[str, Any]]:
         """Get list of available tools from the MCP server."""
@@ -47,48 +127,328 @@ class MCPClient:
         if not self.client:
             raise RuntimeError("MCP client not started")
         return await self.client.call_tool(name, arguments)
+    
+    async def tool_schemas(self) -> List[ChatCompletionToolParam]:
+        """Get the server's tools in OpenAI format, built once per connection."""
+        if self._tool_schemas is None:
+            self._tool_schemas = build_openai_tools_schema(await self.list_tools())
+            self.validators = build_tool_validators(self._tool_schemas)
+        return self._tool_schemas
+
+
+# Live connection reused across main() runs within one event loop
+_shared_client: MCPClient | None = None
+
+async def get_client(server_path: str) -> MCPClient:
+    """Return a started MCPClient for server_path, reusing the shared one when possible."""
+    global _shared_client
+    if _shared_client is not None and _shared_client.client is not None:
+        if _shared_client.server_path == server_path:
+            return _shared_client
+        await _shared_client.stop()
+    _shared_client = MCPClient(server_path)
+    await _shared_client.start()
+    return _shared_client
+
+async def close_shared_client() -> None:
+    """Stop the shared MCP connection, if one is running."""
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.stop()
+        _shared_client = None
+
+
+class LoopDetector:
+    """Detects the model repeating the same tool call with the same arguments."""
+    
+    def __init__(self, window: int = 5, threshold: int = 2):
+        self.window = window
+        self.threshold = threshold
+        self.action_hashes: List[str] = []
+    
+    def record(self, name: str, arguments: Dict[str, Any]) -> bool:
+        """Record a tool call; return True if it repeats within the recent window."""
+        h = hashlib.md5(f"{name}:{json.dumps(arguments, sort_keys=True)}".encode()).hexdigest()
+        self.action_hashes.append(h)
+        recent = self.action_hashes[-self.window:]
+        del self.action_hashes[:-self.window]
+        return recent.count(h) >= self.threshold
 
 
+def _tool_dict(tool: Any) -> Dict[str, Any]:
+    """Return a tool as a dictionary, whether it is a Tool object (Pydantic model) or already a dict."""
+    # by_alias keeps the wire names (inputSchema), which newer mcp releases
+    # otherwise dump as snake_case (input_schema)
+    return tool.model_dump(by_alias=True) if hasattr(tool, "model_dump") else tool
 
-def build_openai_tools_schema(tools: List[Any]) -> List[Dict[str, Any]]:
+def build_openai_tools_schema(tools: List[Any]) -> List[ChatCompletionToolParam]:
     """Convert MCP tools to OpenAI function calling format."""
-    schemas = []
-    for tool in tools:
-        # Handle both Tool objects and dictionaries
-        if hasattr(tool, 'name'):
-            # Tool object (Pydantic model)
-            name = tool.name
-            description = tool.description or ""
-            input_schema = tool.inputSchema or {"type": "object", "properties": {}}
-        else:
-            # Dictionary
-            name = tool.get("name", "unknown")
-            description = tool.get("description", "")
-            input_schema = tool.get("inputSchema", {"type": "object", "properties": {}})
-        
-        schemas.append({
+    return [
+        {
             "type": "function",
             "function": {
-                "name": name,
-                "description": description,
-                "parameters": input_schema,
+                "name": d.get("name") or "unknown",
+                "description": d.get("description") or "",
+                "parameters": d.get("inputSchema") or _EMPTY_SCHEMA,
             },
-        })
-    return schemas
+        }
+        for d in map(_tool_dict, tools)
+    ]
+
+def build_tool_validators(schemas: List[ChatCompletionToolParam]) -> Dict[str, Callable[[Any], Any]]:
+    """Compile each tool's parameter schema into a fast argument validator."""
+    validators = {}
+    for schema in schemas:
+        function = schema["function"]
+        try:
+            # use_default=False: validate only, never fill schema defaults into the arguments
+            validators[function["name"]] = fastjsonschema.compile(function["parameters"], use_default=False)
+        except fastjsonschema.JsonSchemaDefinitionException as e:
+            # Leave validation to the server for schemas we can't compile
+            logger.warning("Skipping argument validation for %s: %s", function["name"], e)
+    return validators
 
 def tool_result_to_text(result: Any) -> str:
     """Convert MCP tool result to text for OpenAI."""
-    try:
-        content = result.get("content", [])
-        if isinstance(content, list):
-            texts = []
-            for block in content:
-                if isinstance(block, dict) and block.get("type") == "text":
-                    texts.append(block.get("text", ""))
-            return "\n".join(texts)
-        return str(result)
-    except Exception:
+    content = getattr(result, "content", None)
+    if content is None and isinstance(result, dict):
+        content = result.get("content")
+    if not isinstance(content, list):
         return str(result)
+    
+    texts: List[str] = []
+    append = texts.append
+    for block in content:
+        # FastMCP returns typed content blocks (e.g. TextContent)
+        text = getattr(block, "text", None)
+        if text is not None:
+            append(text)
+        elif isinstance(block, dict) and block.get("type") == "text":
+            append(block.get("text", ""))
+    
+    joined = "\n".join(texts)
+    # Re-encode JSON payloads compactly so pretty-printing doesn't cost tokens
+    if joined and joined[0] in "{[":
+        try:
+            joined = orjson.dumps(orjson.loads(joined)).decode()
+        except orjson.JSONDecodeError:
+            pass
+    return joined
+
+async def call_tool_limited(
+    mcp_client: MCPClient,
+    semaphore: asyncio.Semaphore,
+    name: str,
+    arguments: Dict[str, Any],
+    previous: asyncio.Task | None = None,
+) -> Any:
+    """Call an MCP tool while holding the concurrency semaphore.
+    
+    If `previous` is given (the last call on the same form), wait for it to
+    finish first so questions are inserted in the order they were requested.
+    """
+    if previous is not None:
+        await asyncio.wait([previous])
+    async with semaphore:
+        return await mcp_client.call_tool(name, arguments)
+
+def compact_tool_messages(
+    rounds: List[List[Tuple[str, ChatCompletionToolMessageParam]]], keep: int = HISTORY_KEEP_ROUNDS
+) -> None:
+    """Shorten tool messages from all but the last `keep` rounds in place to cap prompt growth.
+    
+    Each round holds (tool name, tool message) pairs. The model has already
+    read every result in an older round, so only results it has replied to
+    are cut down; results of PINNED_TOOL_RESULTS tools are never shortened.
+    """
+    for i in range(len(rounds) - keep):
+        for name, message in rounds[i]:
+            if name in PINNED_TOOL_RESULTS:
+                continue
+            content = message["content"]
+            if isinstance(content, str) and len(content) > TOOL_SUMMARY_CHARS:
+                message["content"] = content[:TOOL_SUMMARY_CHARS - 3] + "..."
+
+def parse_tool_arguments(name: str, arguments: str | None) -> Dict[str, Any]:
+    """Decode a tool call's JSON arguments, falling back to no arguments."""
+    if not arguments or arguments == "{}":
+        return {}
+    try:
+        args = orjson.loads(arguments)
+    except orjson.JSONDecodeError as e:
+        logger.error("Error parsing arguments for %s: %s", name, e)
+        return {}
+    if not isinstance(args, dict):
+        logger.error("Error parsing arguments for %s: expected a JSON object, got %s", name, arguments)
+        return {}
+    return args
+
+async def stream_completion(
+    client: AsyncOpenAI,
+    messages: List[ChatCompletionMessageParam],
+    tools: List[ChatCompletionToolParam],
+    on_tool_call: Callable[[ChatCompletionMessageToolCallParam], None],
+) -> Tuple[str, List[ChatCompletionMessageToolCallParam]]:
+    """Stream a chat completion, handing each tool call to on_tool_call as soon as it is complete.
+    
+    Tool calls stream one after another by index, so a call is complete once
+    the next index starts (or the stream ends).
+    Returns the assistant text and the tool calls in order.
+    """
+    # Hold a slot for the whole stream, since it keeps its connection busy
+    async with OPENAI_SEM:
+        stream = await client.chat.completions.create(
+            messages=messages,
+            tools=tools,
+            tool_choice="auto",
+            stream=True,
+            **CHAT_KW,
+        )
+        content_parts: List[str] = []
+        tool_calls: Dict[int, ChatCompletionMessageToolCallParam] = {}
+        current = None
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content_parts.append(delta.content)
+            for tc_delta in delta.tool_calls or []:
+                call = tool_calls.get(tc_delta.index)
+                if call is None:
+                    if current is not None:
+                        on_tool_call(current)
+                    call = tool_calls[tc_delta.index] = {
+                        "id": "",
+                        "type": "function",
+                        "function": {"name": "", "arguments": ""},
+                    }
+                    current = call
+                if tc_delta.id:
+                    call["id"] = tc_delta.id
+                if tc_delta.function:
+                    if tc_delta.function.name:
+                        call["function"]["name"] += tc_delta.function.name
+                    if tc_delta.function.arguments:
+                        call["function"]["arguments"] += tc_delta.function.arguments
+        if current is not None:
+            on_tool_call(current)
+    return "".join(content_parts), [tool_calls[i] for i in sorted(tool_calls)]
+
+def parse_form_request(text: str) -> Tuple[str, List[Dict[str, Any]]] | None:
+    """Parse a request in the canonical Title/Questions format.
+    
+    Returns the title and the questions in order, or None if the text
+    doesn't follow the format.
+    """
+    match = TITLE_RE.match(text)
+    if not match:
+        return None
+    questions = []
+    for raw in match.group(2).split("|"):
+        question = raw.strip()
+        required = REQUIRED_RE.match(question)
+        if required:
+            question = question[required.end():]
+        options = None
+        options_match = OPTIONS_RE.search(question)
+        if options_match:
+            # A single entry like "(in years)" or "(1-5)" is part of the question text
+            choices = [o.strip() for o in options_match.group(1).split(",") if o.strip()]
+            if len(choices) >= 2:
+                options = choices
+                question = question[:options_match.start()].rstrip()
+        if question:
+            questions.append({"title": question, "required": bool(required), "options": options})
+    if not questions:
+        return None
+    return match.group(1), questions
+
+def question_tool_call(form_id: str, question: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Build the MCP tool name and arguments that add one parsed question."""
+    args = {"formId": form_id, "questionTitle": question["title"], "required": question["required"]}
+    if question["options"]:
+        args["options"] = question["options"]
+        return "add_multiple_choice_question", args
+    return "add_text_question", args
+
+def find_form_id(text: str) -> str | None:
+    """Pull the form ID out of a create_form result."""
+    match = FORM_ID_RE.search(text)
+    return (match.group(1) or match.group(2)) if match else None
+
+async def create_form_directly(
+    mcp_client: MCPClient, title: str, questions: List[Dict[str, Any]]
+) -> List[ChatCompletionMessageParam] | None:
+    """Create a parsed form with direct MCP calls, without asking the LLM.
+    
+    Returns None once the request has been handled here. Otherwise returns
+    the messages the LLM should continue from: empty if the server's tools
+    don't accept the arguments we'd send (checked before touching the
+    server), or the create_form call and its result if the form ID can't
+    be read from it or none of the questions could be added.
+    """
+    await mcp_client.tool_schemas()
+    planned = [("create_form", {"title": title})]
+    planned += [question_tool_call("", q) for q in questions]
+    for name, args in planned:
+        validator = mcp_client.validators.get(name)
+        if validator is None:
+            return []
+        try:
+            validator(args)
+        except fastjsonschema.JsonSchemaException:
+            return []
+    
+    logger.info("\n[Executing tool] create_form(%s)", planned[0][1])
+    try:
+        form_text = tool_result_to_text(await mcp_client.call_tool("create_form", planned[0][1]))
+    except Exception as e:
+        logger.error("Error executing tool create_form: %s", e)
+        return None
+    logger.info("Tool result: %s", form_text)
+    form_id = find_form_id(form_text)
+    # The form exists from here on; if we can't fill it, let the LLM read the
+    # create_form result and add the questions instead
+    handoff: List[ChatCompletionMessageParam] = [
+        {
+            "role": "assistant",
+            "content": "",
+            "tool_calls": [{
+                "id": "call_create_form",
+                "type": "function",
+                "function": {"name": "create_form", "arguments": orjson.dumps(planned[0][1]).decode()},
+            }],
+        },
+        {"role": "tool", "tool_call_id": "call_create_form", "content": form_text},
+    ]
+    if not form_id:
+        logger.warning("Could not find the form ID in the create_form result, continuing with the LLM")
+        return handoff
+    
+    # Questions are added one at a time so they keep the order they were given in
+    added = 0
+    for question in questions:
+        name, args = question_tool_call(form_id, question)
+        logger.info("\n[Executing tool] %s(%s)", name, args)
+        try:
+            result = await mcp_client.call_tool(name, args)
+        except Exception as e:
+            logger.error("Error executing tool %s: %s", name, e)
+            continue
+        logger.info("Tool result: %s", tool_result_to_text(result))
+        added += 1
+    
+    if not added:
+        logger.warning("No questions could be added to form %s, continuing with the LLM", form_id)
+        return handoff
+    
+    form_url = FORM_URL_RE.search(form_text)
+    print(
+        f"\nFinal response: Created form '{title}' with {added} of {len(questions)} questions. "
+        f"{form_url.group(0) if form_url else 'Form ID: ' + form_id}"
+    )
+    return None
 
 async def main():
     """Main function to run the OpenAI + Google Forms integration."""
@@ -101,151 +461,194 @@ async def main():
     
     # Path to the built MCP server
     server_path = os.getenv("GOOGLE_FORMS_MCP_PATH", r"C:\Users\PARAMITA PAUL\VV_Courses\googleforms\google-forms-mcp\build\index.js")
-    if not server_path or not os.path.exists(server_path):
-        raise RuntimeError(f"Google Forms MCP server not found at {server_path}")
-    
-    # Get user input
-    # Get user input
-    print("=== Google Forms Creator ===")
-    print("Enter your form details:")
-    print("Format: 'Title: [Your Title] | Questions: [Question 1] | [Question 2] | ...'")
-    print("Example: 'Title: Customer Feedback | Questions: required What are your comments? | How satisfied are you? (Very Satisfied, Satisfied, Neutral, Dissatisfied, Very Dissatisfied)'")
-    print("\nTo mark questions as REQUIRED, prefix them with 'required':")
-    print("Example: 'Title: Survey | Questions: required How would you rate me? (Good, Bad) | What do you think? | required What should I improve?'")
-    print("=" * 80)
-    
-    user_input = input("Enter your form request: ").strip()
+    if not server_path:
+        raise RuntimeError("GOOGLE_FORMS_MCP_PATH is empty")
+    # URLs (http://, stdio://, ...) are handed to FastMCP as-is; only local scripts are checked
+    if "://" not in server_path:
+        server_path = os.path.normpath(os.path.expandvars(os.path.expanduser(server_path)))
+        if not os.path.isfile(server_path):
+            raise RuntimeError(f"Google Forms MCP server not found at {server_path}")
+    
+    # Start MCP server (or reuse the running one) while we wait for input
+    mcp_start_task = asyncio.create_task(get_client(server_path))
+    
+    # Get user input from the command line, or prompt for it
+    try:
+        if len(sys.argv) > 1:
+            user_input = sys.argv[1].strip()
+        else:
+            print(BANNER)
+            user_input = (await asyncio.to_thread(input, "Enter your form request: ")).strip()
+    except BaseException:
+        # EOF on stdin, Ctrl-C, ...: don't leave the server starting in the background
+        mcp_start_task.cancel()
+        await asyncio.gather(mcp_start_task, return_exceptions=True)
+        raise
     if not user_input:
         print("Error: Please provide form details!")
+        mcp_start_task.cancel()
+        await asyncio.gather(mcp_start_task, return_exceptions=True)
         return
     
     print(f"\nProcessing: {user_input}")
     print("=" * 50)
     
-    # Initialize OpenAI client
-    client = OpenAI(api_key=api_key)
+    mcp_client = await mcp_start_task
     
-    # Start MCP server and get tools
-    mcp_client = MCPClient(server_path)
-    try:
-        await mcp_client.start()
-        tools = await mcp_client.list_tools()
-        openai_tools = build_openai_tools_schema(tools)
+    # Requests in the canonical format don't need the LLM to parse them
+    parsed = parse_form_request(user_input)
+    prior_messages: List[ChatCompletionMessageParam] = []
+    if parsed is not None:
+        handoff = await create_form_directly(mcp_client, *parsed)
+        if handoff is None:
+            return
+        prior_messages = handoff
+    
+    # Initialize OpenAI client (aiohttp transport, shared for the whole session)
+    # Build Limits with the SDK's own class (httpx or httpx2, depending on the release)
+    limits = type(DEFAULT_CONNECTION_LIMITS)(max_connections=OPENAI_MAX_CONNECTIONS)
+    http_client = DefaultAioHttpClient(limits=limits)
+    async with AsyncOpenAI(api_key=api_key, http_client=http_client) as client:
+        openai_tools = await mcp_client.tool_schemas()
         
         # Prepare messages for OpenAI
-        messages = [
-            {
-    "role": "system", 
-    "content": "You are a helpful assistant that creates Google Forms. IMPORTANT: When creating forms, you can ONLY set the title during creation - do NOT include a description parameter. After creating a form, you MUST immediately add ALL the requested questions using add_text_question and add_multiple_choice_question tools in the EXACT ORDER they appear in the user input. Do not reorder questions - maintain the sequence provided. Do not stop after creating the form - continue until all questions are added. Parse the user input to extract the title and questions. For multiple choice questions, if options are provided in parentheses, use them. Otherwise, create reasonable default options. REQUIRED QUESTIONS: If a question is prefixed with 'required' (e.g., 'required How would you rate me...'), set required: true. If no 'required' prefix is present, set required: false. Always provide the final form URL when complete."
-},
+        messages: List[ChatCompletionMessageParam] = [
+            SYSTEM_MSG,
             {"role": "user", "content": user_input},
+            *prior_messages,
         ]
         
-        # First OpenAI call
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            tools=openai_tools,
-            tool_choice="auto",
-            temperature=0.2,
-        )
-        
-        choice = response.choices[0]
-        msg = choice.message
+        # Keep executing tools until AI is done
+        max_iterations = 10  # Prevent infinite loops
+        iteration = 0
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_TOOL_CALLS)
+        detector = LoopDetector()
+        loop_detected = False
+        content = ""
+        tool_calls: List[ChatCompletionMessageToolCallParam] = []
+        compactable: List[List[Tuple[str, ChatCompletionToolMessageParam]]] = []
         
-        if msg.content:
-            print("Assistant:", msg.content)
-        
-        # Execute tool calls if any
-        if getattr(msg, "tool_calls", None):
+        while iteration < max_iterations:
+            iteration += 1
+            logger.info("\n--- Iteration %d ---", iteration)
+            tasks: Dict[str, asyncio.Task] = {}
+            errors: Dict[str, str] = {}
+            # Last call per formId; calls on the same form run one after another
+            form_chains: Dict[str, asyncio.Task] = {}
+            
+            def dispatch(call: ChatCompletionMessageToolCallParam) -> None:
+                """Start executing a tool call while the rest of the response streams."""
+                nonlocal loop_detected
+                name = call["function"]["name"]
+                args = parse_tool_arguments(name, call["function"]["arguments"])
+                if detector.record(name, args):
+                    logger.warning("Loop detected: %s(%s) repeated, stopping", name, args)
+                    loop_detected = True
+                    errors[call["id"]] = "Error: repeated tool call skipped"
+                    return
+                validator = mcp_client.validators.get(name)
+                if validator is not None:
+                    try:
+                        validator(args)
+                    except fastjsonschema.JsonSchemaException as e:
+                        logger.error("Invalid arguments for %s: %s", name, e.message)
+                        errors[call["id"]] = f"Error: invalid arguments: {e.message}"
+                        return
+                logger.info("\n[Executing tool] %s(%s)", name, args)
+                form_id = args.get("formId")
+                if not isinstance(form_id, str):
+                    form_id = None
+                previous = form_chains.get(form_id) if form_id else None
+                task = asyncio.create_task(
+                    call_tool_limited(mcp_client, semaphore, name, args, previous)
+                )
+                tasks[call["id"]] = task
+                if form_id:
+                    form_chains[form_id] = task
+            
+            try:
+                content, tool_calls = await stream_completion(client, messages, openai_tools, dispatch)
+            except BaseException:
+                # Don't leave calls started mid-stream running against the form
+                for task in tasks.values():
+                    task.cancel()
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
+                raise
+            
+            # If no more tool calls, we're done
+            if not tool_calls:
+                break
+            
+            if content:
+                logger.info("Assistant: %s", content)
+            
             messages.append({
                 "role": "assistant",
-                "content": msg.content or "",
-                "tool_calls": msg.tool_calls
+                "content": content,
+                "tool_calls": tool_calls,
             })
             
-            # Keep executing tools until AI is done
-            max_iterations = 10  # Prevent infinite loops
-            iteration = 0
+            results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+            round_messages: List[Tuple[str, ChatCompletionToolMessageParam]] = []
+            compactable.append(round_messages)
+            results_by_id = dict(zip(tasks, results))
             
-            while iteration < max_iterations:
-                iteration += 1
-                print(f"\n--- Iteration {iteration} ---")
-                
-                # Execute all tool calls in this round
-                tool_calls_made = False
-                for tc in msg.tool_calls:
-                    if tc.type == "function":
-                        name = tc.function.name
-                        arguments = tc.function.arguments or "{}"
-                        try:
-                            args = json.loads(arguments)
-                        except Exception as e:
-                            print(f"Error parsing arguments for {name}: {e}")
-                            args = {}
-                        
-                        print(f"\n[Executing tool] {name}({args})")
-                        try:
-                            result = await mcp_client.call_tool(name, args)
-                            result_text = tool_result_to_text(result)
-                            print("Tool result:", result_text)
-                            
-                            messages.append({
-                                "role": "tool",
-                                "tool_call_id": tc.id,
-                                "content": result_text,
-                            })
-                            tool_calls_made = True
-                        except Exception as e:
-                            print(f"Error executing tool {name}: {e}")
-                            messages.append({
-                                "role": "tool",
-                                "tool_call_id": tc.id,
-                                "content": f"Error: {str(e)}",
-                            })
-                            tool_calls_made = True
-                
-                if not tool_calls_made:
-                    break
-                    
-                # Ask AI to continue adding questions
-                continue_response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=messages + [{"role": "user", "content": "Continue adding the remaining questions. Don't ask for confirmation - just add them immediately."}],
-                    tools=openai_tools,
-                    tool_choice="auto",
-                    temperature=0.2,
-                )
+            for call in tool_calls:
+                name = call["function"]["name"]
+                if call["id"] in errors:
+                    result_text = errors[call["id"]]
+                else:
+                    result = results_by_id[call["id"]]
+                    if isinstance(result, Exception):
+                        logger.error("Error executing tool %s: %s", name, result)
+                        result_text = f"Error: {str(result)}"
+                    else:
+                        result_text = tool_result_to_text(result)
+                        logger.info("Tool result: %s", result_text)
                 
-                choice = continue_response.choices[0]
-                msg = choice.message
-                
-                if msg.content:
-                    print("Assistant:", msg.content)
-                
-                # If no more tool calls, we're done
-                if not getattr(msg, "tool_calls", None):
-                    break
-                    
-                # Add the assistant's response to messages
-                messages.append({
-                    "role": "assistant",
-                    "content": msg.content or "",
-                    "tool_calls": msg.tool_calls
-                })
+                tool_message: ChatCompletionToolMessageParam = {
+                    "role": "tool",
+                    "tool_call_id": call["id"],
+                    "content": result_text,
+                }
+                messages.append(tool_message)
+                round_messages.append((name, tool_message))
             
-            print(f"\n--- Completed after {iteration} iterations ---")
+            compact_tool_messages(compactable)
             
-            # Final response after all tool execution
-            final_response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                temperature=0.2,
-            )
+            if loop_detected:
+                break
+        
+        logger.info("\n--- Completed after %d iterations ---", iteration)
+        
+        if tool_calls:
+            # Iteration cap or loop guard hit with tool results still unanswered
+            async with OPENAI_SEM:
+                final_response = await client.chat.completions.create(
+                    messages=messages,
+                    **CHAT_KW,
+                )
             print("\nFinal response:", final_response.choices[0].message.content)
-    
+        else:
+            print("\nFinal response:", content)
+
+async def run():
+    """Run main and shut down the shared MCP connection on the way out."""
+    try:
+        await main()
     finally:
-        await mcp_client.stop()
+        await close_shared_client()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # Progress goes to stdout through this module's logger only; the root
+    # logger keeps its default level so library INFO records stay quiet
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if uvloop is not None:
+        uvloop.run(run())
+    else:
+        asyncio.run(run())
+
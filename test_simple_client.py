@@ -0,0 +1,230 @@
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+import fastjsonschema
+import pytest
+from mcp.types import Tool
+
+from simple_client import (
+    HISTORY_KEEP_ROUNDS,
+    TOOL_SUMMARY_CHARS,
+    LoopDetector,
+    build_openai_tools_schema,
+    build_tool_validators,
+    compact_tool_messages,
+    create_form_directly,
+    find_form_id,
+    parse_form_request,
+    parse_tool_arguments,
+    stream_completion,
+)
+
+SAMPLE_TEMPLATE = Path(__file__).with_name("sample template")
+
+
+def test_parses_sample_template():
+    title, questions = parse_form_request(SAMPLE_TEMPLATE.read_text())
+    assert title == "AI Engineering Course Feedback"
+    assert len(questions) == 15
+    assert questions[0] == {
+        "title": "How would you rate the overall course content?",
+        "required": True,
+        "options": ["Excellent", "Very Good", "Good", "Fair", "Poor"],
+    }
+    assert questions[1] == {
+        "title": "What was the most valuable topic covered in this course?",
+        "required": False,
+        "options": None,
+    }
+    assert questions[-1]["title"] == "Any additional comments or suggestions for the instructor?"
+
+
+def test_required_prefix_is_case_insensitive():
+    _, questions = parse_form_request("Title: T | Questions: Required Name? | requiredness matters?")
+    assert questions[0] == {"title": "Name?", "required": True, "options": None}
+    assert questions[1] == {"title": "requiredness matters?", "required": False, "options": None}
+
+
+def test_single_parenthetical_stays_in_title():
+    _, questions = parse_form_request("Title: T | Questions: Your age (in years) | Rate us (1-5)")
+    assert questions == [
+        {"title": "Your age (in years)", "required": False, "options": None},
+        {"title": "Rate us (1-5)", "required": False, "options": None},
+    ]
+
+
+def test_freeform_input_falls_back():
+    assert parse_form_request("Create a survey about customer satisfaction") is None
+    assert parse_form_request("Title: Only a title") is None
+    assert parse_form_request("Title: T | Questions:  | ") is None
+
+
+def test_tool_schema_keeps_mcp_input_schema():
+    input_schema = {
+        "type": "object",
+        "properties": {
+            "formId": {"type": "string"},
+            "questionTitle": {"type": "string"},
+            "required": {"type": "boolean", "default": False},
+        },
+        "required": ["formId", "questionTitle"],
+    }
+    tool = Tool(name="add_text_question", description="Add a text question", inputSchema=input_schema)
+
+    schemas = build_openai_tools_schema([tool])
+    assert schemas == [{
+        "type": "function",
+        "function": {
+            "name": "add_text_question",
+            "description": "Add a text question",
+            "parameters": input_schema,
+        },
+    }]
+
+    validate = build_tool_validators(schemas)["add_text_question"]
+    args = {"formId": "f", "questionTitle": "q"}
+    validate(args)
+    assert args == {"formId": "f", "questionTitle": "q"}
+    with pytest.raises(fastjsonschema.JsonSchemaException):
+        validate({})
+
+
+def test_find_form_id_needs_a_separator():
+    assert find_form_id('{"formId": "1AbC-x"}') == "1AbC-x"
+    assert find_form_id("Form ID: 1abc") == "1abc"
+    assert find_form_id("https://docs.google.com/forms/d/QQ1/edit") == "QQ1"
+    assert find_form_id("Created form. Form ID is 1FAbc") is None
+
+
+class FakeFormsServer:
+    """Stands in for MCPClient: accepts any arguments, fails every question."""
+
+    def __init__(self, create_form_text):
+        self.create_form_text = create_form_text
+        self.validators = {
+            "create_form": lambda args: args,
+            "add_text_question": lambda args: args,
+        }
+
+    async def tool_schemas(self):
+        return []
+
+    async def call_tool(self, name, arguments):
+        if name == "create_form":
+            return {"content": [{"type": "text", "text": self.create_form_text}]}
+        raise RuntimeError("form not found")
+
+
+def test_create_form_directly_hands_off_when_no_question_is_added():
+    server = FakeFormsServer('{"formId": "f1"}')
+    handoff = asyncio.run(create_form_directly(server, "T", [{"title": "Q?", "required": False, "options": None}]))
+    assert handoff[0]["tool_calls"][0]["function"]["name"] == "create_form"
+    assert handoff[1] == {"role": "tool", "tool_call_id": "call_create_form", "content": '{"formId":"f1"}'}
+
+
+def test_loop_detector_flags_repeats_inside_the_window():
+    detector = LoopDetector()
+    assert not detector.record("add_text_question", {"formId": "f", "questionTitle": "Q"})
+    assert not detector.record("add_text_question", {"formId": "f", "questionTitle": "Other"})
+    # Same call with the keys in a different order still counts as a repeat
+    assert detector.record("add_text_question", {"questionTitle": "Q", "formId": "f"})
+
+
+def test_loop_detector_forgets_calls_outside_the_window():
+    detector = LoopDetector()
+    assert not detector.record("create_form", {"title": "T"})
+    for i in range(5):
+        assert not detector.record("add_text_question", {"questionTitle": str(i)})
+    assert not detector.record("create_form", {"title": "T"})
+    assert len(detector.action_hashes) == 5
+
+
+def tool_round(*names):
+    return [(name, {"role": "tool", "tool_call_id": name, "content": f"{name} result " + "x" * 60}) for name in names]
+
+
+def test_compaction_only_shortens_rounds_older_than_the_window():
+    rounds = []
+    for _ in range(4):
+        rounds.append(tool_round("add_text_question", "add_text_question"))
+        compact_tool_messages(rounds)
+
+    oldest, *recent = rounds
+    assert all(len(message["content"]) == TOOL_SUMMARY_CHARS for _, message in oldest)
+    assert oldest[0][1]["content"].endswith("...")
+    assert all(len(message["content"]) > TOOL_SUMMARY_CHARS for r in recent for _, message in r)
+
+
+def test_compaction_keeps_pinned_create_form_results():
+    rounds = [tool_round("create_form", "add_text_question")]
+    rounds += [tool_round("add_text_question") for _ in range(HISTORY_KEEP_ROUNDS)]
+    compact_tool_messages(rounds)
+
+    (_, form_message), (_, question_message) = rounds[0]
+    assert form_message["content"] == "create_form result " + "x" * 60
+    assert len(question_message["content"]) == TOOL_SUMMARY_CHARS
+
+
+def test_compaction_keeps_a_large_current_round_whole():
+    rounds = [tool_round(*["add_text_question"] * 6)]
+    compact_tool_messages(rounds)
+    assert all(message["content"].endswith("x" * 60) for _, message in rounds[0])
+
+
+@pytest.mark.parametrize("arguments", [None, "", "{}", "[]", "null", '"text"', "{bad json", '{"title": '])
+def test_parse_tool_arguments_falls_back_to_no_arguments(arguments):
+    assert parse_tool_arguments("create_form", arguments) == {}
+
+
+def test_parse_tool_arguments_decodes_objects():
+    assert parse_tool_arguments("create_form", '{"title": "T"}') == {"title": "T"}
+
+
+def chunk(content=None, tool_calls=None):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content, tool_calls=tool_calls))])
+
+
+def tool_delta(index, id=None, name=None, arguments=None):
+    return SimpleNamespace(index=index, id=id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+class FakeStreamingClient:
+    """Stands in for AsyncOpenAI, replaying a fixed list of stream chunks."""
+
+    def __init__(self, chunks):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.chunks = chunks
+
+    async def create(self, **kwargs):
+        async def stream():
+            for c in self.chunks:
+                yield c
+        return stream()
+
+
+def test_stream_completion_assembles_split_tool_calls():
+    chunks = [
+        chunk(content="Creating "),
+        chunk(content="the form."),
+        chunk(tool_calls=[tool_delta(0, id="call_a", name="create_", arguments='{"ti')]),
+        chunk(tool_calls=[tool_delta(0, name="form", arguments='tle": "T"}')]),
+        SimpleNamespace(choices=[]),
+        chunk(tool_calls=[tool_delta(1, id="call_b", name="add_text_question", arguments='{"formId"')]),
+        chunk(tool_calls=[tool_delta(1, arguments=': "f"}')]),
+    ]
+    dispatched = []
+
+    def on_tool_call(call):
+        dispatched.append((call["id"], call["function"]["name"], call["function"]["arguments"]))
+
+    content, tool_calls = asyncio.run(stream_completion(FakeStreamingClient(chunks), [], [], on_tool_call))
+
+    assert content == "Creating the form."
+    expected = [
+        ("call_a", "create_form", '{"title": "T"}'),
+        ("call_b", "add_text_question", '{"formId": "f"}'),
+    ]
+    # Each call is handed off complete, in index order
+    assert dispatched == expected
+    assert [(c["id"], c["function"]["name"], c["function"]["arguments"]) for c in tool_calls] == expected